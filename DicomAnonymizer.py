@@ -1,13 +1,19 @@
 import hashlib
 import logging
 import pydicom
+from pydicom.datadict import tag_for_keyword
 import tempfile
 import os
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 from netrt_core.pid_manager import PIDManager
+from netrt_core.worker_pool import resolve_max_workers
 
 logger = logging.getLogger(__name__)
 
+# Set explicitly from the anonymized ID/config, so the generic rules must leave them alone
+_REMOVE_EXEMPT_KEYWORDS = ('PatientID', 'PatientName', 'StudyDescription')
+_EMPTY_EXEMPT_KEYWORDS = ('PatientID', 'PatientName')
+
 class DicomAnonymizer:
     """
     A class to anonymize DICOM files according to NEMA standards while preserving
@@ -24,13 +30,41 @@ class DicomAnonymizer:
         self.config = anonymization_config or {}
         self.pid_manager = PIDManager(self.config)
         
-        self.tags_to_remove = self.config.get("rules", {}).get("remove_tags", [])
-        self.tags_to_empty = self.config.get("rules", {}).get("blank_tags", [])
+        rules = self.config.get("rules") or {}
+        self.tags_to_remove = rules.get("remove_tags") or []
+        self.tags_to_empty = rules.get("blank_tags") or []
+        
+        # Resolve keywords to tags once so the per-file loops are plain dict lookups
+        self._remove_tags = self._resolve_tags(self.tags_to_remove, _REMOVE_EXEMPT_KEYWORDS)
+        self._empty_tags = self._resolve_tags(self.tags_to_empty, _EMPTY_EXEMPT_KEYWORDS)
         
         logger.debug(f"DicomAnonymizer initialized with config: {self.config}")
         logger.debug(f"Tags to remove: {self.tags_to_remove}")
         logger.debug(f"Tags to empty: {self.tags_to_empty}")
 
+    @staticmethod
+    def _resolve_tags(keywords, exempt_keywords=()):
+        """
+        Resolve DICOM keywords to tags, dropping exempt and unknown keywords.
+        
+        Args:
+            keywords (list): DICOM keywords from the anonymization rules
+            exempt_keywords (tuple): Keywords the rule must never touch
+            
+        Returns:
+            tuple: Tags for every non-exempt keyword in the data dictionary
+        """
+        resolved = []
+        for keyword in keywords:
+            if keyword in exempt_keywords:
+                continue
+            tag = tag_for_keyword(keyword)
+            if tag is None:
+                logger.warning(f"Unknown DICOM keyword in anonymization rules, ignoring: {keyword}")
+                continue
+            resolved.append(tag)
+        return tuple(resolved)
+
     def anonymize(self, dicom_obj):
         """
         Anonymize a DICOM object according to the configured rules.
@@ -64,17 +98,14 @@ class DicomAnonymizer:
         
         logger.debug(f"Applied consistent anonymized ID: {anonymized_id}")
         
-        for tag in self.tags_to_remove:
-            if tag in ['PatientID', 'PatientName', 'StudyDescription']:
-                continue
-            if hasattr(dicom_obj, tag):
-                delattr(dicom_obj, tag)
+        # One lookup per tag: pop/get do the presence check and the access together
+        for tag in self._remove_tags:
+            dicom_obj.pop(tag, None)
         
-        for tag in self.tags_to_empty:
-            if tag in ['PatientID', 'PatientName']:
-                continue
-            if hasattr(dicom_obj, tag):
-                setattr(dicom_obj, tag, '')
+        for tag in self._empty_tags:
+            elem = dicom_obj.get(tag)
+            if elem is not None:
+                elem.value = ''
         
         return dicom_obj
 
@@ -85,10 +116,11 @@ class DicomAnonymizer:
             anonymized_ds = self.anonymize(ds)
 
             temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), prefix=".tmp-")
-            anonymized_ds.save_as(temp_path, enforce_file_format=True)
             os.close(temp_fd)
+            anonymized_ds.save_as(temp_path, enforce_file_format=True)
 
-            shutil.move(temp_path, filepath)
+            # The temp file sits next to the target, so this is a single atomic rename
+            os.replace(temp_path, filepath)
             logger.debug(f"Successfully anonymized and replaced {filepath}")
         except Exception as e:
             logger.error(f"Failed to anonymize file {filepath}: {e}", exc_info=True)
@@ -96,6 +128,21 @@ class DicomAnonymizer:
                 os.remove(temp_path)
             raise
     
+    def anonymize_files(self, filepaths, max_workers=None):
+        """
+        Anonymize many DICOM files in place, overlapping their read/write I/O.
+        
+        Threads rather than processes are used so that every file goes through
+        this instance's PIDManager and receives the same anonymized patient ID.
+        
+        Args:
+            filepaths (iterable): Paths of the DICOM files to anonymize
+            max_workers (int): Number of worker threads (processing.max_workers;
+                defaults to resolve_max_workers()'s bound)
+        """
+        with ThreadPoolExecutor(max_workers=resolve_max_workers(max_workers)) as executor:
+            list(executor.map(self.anonymize_file, filepaths))
+    
     def _generate_patient_id(self):
         """Generate a random patient ID for full anonymization"""
         import uuid
@@ -106,21 +153,15 @@ class DicomAnonymizer:
         """Modify date while preserving year/month"""
         if not date_str:
             return ''
-        try:
-            # Keep year and month, set day to 01
-            return date_str[:6] + '01'
-        except:
-            return ''
+        # Keep year and month, set day to 01
+        return date_str[:6] + '01'
 
     def _handle_time(self, time_str):
         """Modify time while preserving hour"""
         if not time_str:
             return ''
-        try:
-            # Keep hour, zero out minutes and seconds
-            return time_str[:2] + '0000.000'
-        except:
-            return ''
+        # Keep hour, zero out minutes and seconds
+        return time_str[:2] + '0000.000'
 
     def _generate_uid(self, original_uid):
         """
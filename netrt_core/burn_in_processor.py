@@ -3,54 +3,83 @@ import logging
 import pydicom
 import numpy as np
 import cv2
-import copy
 import tempfile
 import shutil
+from .worker_pool import worker_pool
 
 logger = logging.getLogger(__name__)
 
 class BurnInProcessor:
     """A class to apply a text burn-in to a directory of DICOM images."""
 
-    def __init__(self, burn_in_text):
+    def __init__(self, burn_in_text, max_workers=None):
         """
         Initializes the BurnInProcessor.
 
         Args:
             burn_in_text (str): The text to burn into the images.
+            max_workers (int, optional): Worker count for runs that are not handed an executor.
         """
         self.burn_in_text = burn_in_text
+        self.max_workers = max_workers
+        self._font = cv2.FONT_HERSHEY_SIMPLEX
+        self._font_scale = 0.5
+        self._thickness = 1
+        # The text and font never change, so measure the text once rather than per file
+        self._text_size, self._text_baseline = (
+            cv2.getTextSize(self.burn_in_text, self._font, self._font_scale, self._thickness)
+            if self.burn_in_text else ((0, 0), 0)
+        )
 
-    def run(self, directory_path):
+    def run(self, directory_path, executor=None):
         """
         Applies the burn-in to all DICOM files in the specified directory.
 
         Args:
             directory_path (str): The absolute path to the directory of DICOM files.
+            executor (Executor, optional): Pool to run on; a new one is created when not given.
         """
         logger.info(f"Applying burn-in text to DICOM files in {directory_path}")
+        filepaths = []
         for root, _, files in os.walk(directory_path):
             for file in files:
                 if file.lower().endswith(".dcm"):
                     filepath = os.path.join(root, file)
-                    self._apply_watermark_safe(filepath)
+                    if self._is_dicom_file(filepath):
+                        filepaths.append(filepath)
+                    else:
+                        logger.warning(f"File {filepath} is not a DICOM Part 10 file. Skipping burn-in.")
+
+        # Each file is an independent read-draw-write, so spread them over the worker pool.
+        # Only this instance (the burn-in text) and the file paths are pickled to workers.
+        with worker_pool(executor, self.max_workers) as pool:
+            list(pool.map(self._apply_watermark_safe, filepaths, chunksize=8))
+
+    @staticmethod
+    def _is_dicom_file(filepath):
+        """Checks for the 'DICM' magic number after the 128-byte preamble without parsing the file."""
+        try:
+            with open(filepath, "rb") as f:
+                f.seek(128)
+                return f.read(4) == b"DICM"
+        except OSError:
+            return False
 
     def _apply_watermark_safe(self, filepath):
         """Safely applies a watermark to a single DICOM file."""
         try:
-            dcm = pydicom.dcmread(filepath, force=True)
+            # run() only passes files with a Part 10 preamble, so no force=True is needed
+            dcm = pydicom.dcmread(filepath)
             if "PixelData" not in dcm:
                 logger.warning(f"File {filepath} has no PixelData to apply burn-in. Skipping.")
                 return
 
-            img_rescaled = self._rescale_pixel_array(dcm.pixel_array)
-            img_watermarked = self._draw_text(img_rescaled)
-            
-            new_dcm = self._create_new_dicom_dataset(dcm, img_watermarked)
+            # The dataset is written straight back to the same path, so update it in place
+            dcm.PixelData = self._burn_in_region(dcm.pixel_array).tobytes()
 
             # Write to a temporary file and then replace the original
             temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), prefix=".tmp-")
-            pydicom.dcmwrite(temp_path, new_dcm, enforce_file_format=True)
+            pydicom.dcmwrite(temp_path, dcm, enforce_file_format=True)
             os.close(temp_fd)
             shutil.move(temp_path, filepath)
             logger.debug(f"Successfully applied burn-in to {filepath}")
@@ -61,43 +90,65 @@ class BurnInProcessor:
                 os.remove(temp_path)
             raise
 
-    def _rescale_pixel_array(self, pixel_array):
-        """Rescales pixel data to 8-bit for image processing."""
+    def _burn_in_region(self, pixel_array):
+        """
+        Burns the text into a copy of the pixel array in its native dtype.
+
+        Only the small bottom-right region holding the text is rescaled to 8-bit
+        for drawing, and only the pixels the drawing changed are mapped back to
+        the original range. The rest of the image keeps its full precision.
+        """
+        rows, cols = pixel_array.shape[:2]
+        text_width, text_height = self._text_size
+        baseline = self._text_baseline
+
+        # Position in the bottom-right corner
+        x = cols - text_width - 10
+        y = rows - text_height - 10
+
+        # Bounding box of the background rectangle and glyphs, padded for anti-aliasing
+        margin = self._thickness + 2
+        top = max(y - text_height - 2 - margin, 0)
+        bottom = min(y + max(baseline, 2) + margin + 1, rows)
+        left = max(x - margin, 0)
+        right = min(x + text_width + margin + 1, cols)
+
         min_val = np.min(pixel_array)
         max_val = np.max(pixel_array)
+
+        region_8bit = self._rescale_pixel_array(pixel_array[top:bottom, left:right], min_val, max_val)
+        region_drawn = self._draw_text(region_8bit.copy(), (x - left, y - top))
+        changed = region_drawn != region_8bit
+
+        watermarked = pixel_array.copy()
+        watermarked[top:bottom, left:right][changed] = self._restore_pixel_range(
+            region_drawn[changed], min_val, max_val, pixel_array.dtype
+        )
+        return watermarked
+
+    def _rescale_pixel_array(self, pixel_array, min_val, max_val):
+        """Rescales pixel data to 8-bit for image processing."""
         if max_val == min_val:
             return np.zeros(pixel_array.shape, dtype=np.uint8)
+        if np.issubdtype(pixel_array.dtype, np.integer):
+            # Integer math in int64: no float temporaries, and no int16 overflow on (pixel - min)
+            value_range = int(max_val) - int(min_val)
+            return ((pixel_array.astype(np.int64) - int(min_val)) * 255 // value_range).astype(np.uint8)
         return ((pixel_array - min_val) / (max_val - min_val) * 255).astype(np.uint8)
 
-    def _draw_text(self, image):
-        """Draws the configured burn-in text onto the image."""
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.5
-        color = (255, 255, 255) # White
-        thickness = 1
+    def _restore_pixel_range(self, values_8bit, min_val, max_val, dtype):
+        """Maps 8-bit values back to the original data range."""
+        if max_val == min_val:
+            return np.full(values_8bit.shape, min_val, dtype=dtype)
+        return ((values_8bit / 255.0) * (float(max_val) - float(min_val)) + float(min_val)).astype(dtype)
 
-        text_size = cv2.getTextSize(self.burn_in_text, font, font_scale, thickness)[0]
-        
-        # Position in the bottom-right corner
-        x = image.shape[1] - text_size[0] - 10
-        y = image.shape[0] - text_size[1] - 10
+    def _draw_text(self, image, origin):
+        """Draws the configured burn-in text onto the image with its baseline starting at origin."""
+        color = (255, 255, 255) # White
+        x, y = origin
+        text_size = self._text_size
 
         # Draw a black rectangle behind the text for readability
         cv2.rectangle(image, (x, y + 2), (x + text_size[0], y - text_size[1] - 2), (0, 0, 0), cv2.FILLED)
-        cv2.putText(image, self.burn_in_text, (x, y), font, font_scale, color, thickness, cv2.LINE_AA)
+        cv2.putText(image, self.burn_in_text, (x, y), self._font, self._font_scale, color, self._thickness, cv2.LINE_AA)
         return image
-
-    def _create_new_dicom_dataset(self, original_dcm, watermarked_image_8bit):
-        """Creates a new DICOM dataset with the watermarked pixel data."""
-        new_dcm = copy.deepcopy(original_dcm)
-        
-        # Rescale the 8-bit watermarked image back to the original data range
-        original_min = np.min(original_dcm.pixel_array)
-        original_max = np.max(original_dcm.pixel_array)
-        if original_max == original_min:
-            rescaled_pixel_data = np.full(watermarked_image_8bit.shape, original_min, dtype=original_dcm.pixel_array.dtype)
-        else:
-            rescaled_pixel_data = ((watermarked_image_8bit / 255.0) * (original_max - original_min) + original_min)
-        
-        new_dcm.PixelData = rescaled_pixel_data.astype(original_dcm.pixel_array.dtype).tobytes()
-        return new_dcm
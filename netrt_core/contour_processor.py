@@ -1,23 +1,37 @@
 import os
 import logging
-import re
 import datetime
 import numpy as np
 import pydicom
 from pydicom import dcmread, uid
 from pydicom.tag import Tag
-from pydicom.pixels import pack_bits
 from rt_utils import RTStructBuilder
 import matplotlib
 import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.colors import ListedColormap
 import tempfile
 import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .worker_pool import resolve_max_workers, worker_pool
 matplotlib.use('Agg')
 
 logger = logging.getLogger(__name__)
 
+# Spatial tags rt-utils needs on every CT slice
+_SPATIAL_TAGS = ['ImageOrientationPatient', 'ImagePositionPatient']
+
+# Overlay plane elements, built once instead of constructing Tag objects for every slice
+_OVERLAY_GROUP = 0x6000
+_OVERLAY_ROWS = Tag(_OVERLAY_GROUP, 0x0010)
+_OVERLAY_COLUMNS = Tag(_OVERLAY_GROUP, 0x0011)
+_OVERLAY_DATA = Tag(_OVERLAY_GROUP, 0x3000)
+_OVERLAY_FIXED_ELEMENTS = (
+    (Tag(_OVERLAY_GROUP, 0x0015), 'IS', '1'),     # Number of Frames in Overlay
+    (Tag(_OVERLAY_GROUP, 0x0040), 'CS', 'R'),     # ROI Area
+    (Tag(_OVERLAY_GROUP, 0x0050), 'SS', [1, 1]),  # Overlay Origin
+    (Tag(_OVERLAY_GROUP, 0x0100), 'US', 1),       # Bits Allocated
+    (Tag(_OVERLAY_GROUP, 0x0102), 'US', 0),       # Bit Position
+)
+
 class ContourProcessor:
     """Processes RTSTRUCT files to create a new series with contour overlays."""
 
@@ -30,9 +44,11 @@ class ContourProcessor:
         """
         self.processing_config = config.get("processing", {})
 
-    def run(self, dcm_path, struct_path, output_path, debug_mode=False, study_uid=None, burn_in_text=None):
+    def run(self, dcm_path, struct_path, output_path, debug_mode=False, study_uid=None, burn_in_text=None, executor=None):
         """
         Executes the full contour processing pipeline.
+
+        The per-slice steps run on `executor` when one is given; otherwise on a pool created for this run.
         """
         try:
             os.makedirs(output_path, exist_ok=True)
@@ -43,18 +59,24 @@ class ContourProcessor:
                 dicom_series_path=dcm_path,
                 rt_struct_path=struct_path
             )
+            # Rasterized ROI masks, shared by the overlay and debug steps so each ROI is decoded once
+            roi_masks = {}
+
             # Get first non-SKULL contour for overlay series
-            first_contour_mask = self._create_first_contour_mask(rt_struct)
-            self._create_overlay_series(dcm_path, first_contour_mask, output_path)
-
-            debug_dicom_dir = None
-            if debug_mode:
-                # For debug visualization, get individual contours for colored display
-                individual_contours = self._get_individual_contours(rt_struct)
-                # Create JPG debug images with colored contours
-                self.save_debug_visualization(dcm_path, individual_contours, os.path.dirname(output_path), study_uid or "UNKNOWN", burn_in_text=burn_in_text)
-                # Create DICOM debug series with colored contours
-                debug_dicom_dir = self.create_debug_dicom_series(dcm_path, individual_contours, os.path.dirname(output_path), study_uid or "UNKNOWN", burn_in_text=burn_in_text)
+            first_contour_mask = self._create_first_contour_mask(rt_struct, roi_masks)
+            # Every output series walks the same slice order; read the headers for it only once
+            sorted_files = self._sort_dicom_files(dcm_path)
+            with worker_pool(executor, self.processing_config.get("max_workers")) as pool:
+                self._create_overlay_series(dcm_path, sorted_files, first_contour_mask, output_path, pool)
+
+                debug_dicom_dir = None
+                if debug_mode:
+                    # For debug visualization, get individual contours for colored display
+                    individual_contours = self._get_individual_contours(rt_struct, roi_masks)
+                    # Create JPG debug images with colored contours
+                    self.save_debug_visualization(dcm_path, individual_contours, os.path.dirname(output_path), study_uid or "UNKNOWN", burn_in_text=burn_in_text, sorted_files=sorted_files, executor=pool)
+                    # Create DICOM debug series with colored contours
+                    debug_dicom_dir = self.create_debug_dicom_series(dcm_path, individual_contours, os.path.dirname(output_path), study_uid or "UNKNOWN", burn_in_text=burn_in_text, sorted_files=sorted_files)
 
             return True, debug_dicom_dir  # Return debug dir path for sending
         except Exception as e:
@@ -74,15 +96,17 @@ class ContourProcessor:
         
         # First, try to find orientation from any existing CT image that has it
         orientation = None
-        ct_files = [f for f in os.listdir(dcm_path) if f.lower().endswith('.dcm')]
+        # scandir entries already carry the full path and file type; no extra join/stat per file
+        with os.scandir(dcm_path) as it:
+            ct_entries = [e for e in it if e.is_file() and e.name.lower().endswith('.dcm')]
         
-        logger.info(f"Checking {len(ct_files)} CT images for required spatial tags...")
+        logger.info(f"Checking {len(ct_entries)} CT images for required spatial tags...")
         
-        for ct_file in ct_files:
+        for entry in ct_entries:
+            ct_file, ct_path = entry.name, entry.path
             try:
-                ct_path = os.path.join(dcm_path, ct_file)
-                ct_ds = dcmread(ct_path, stop_before_pixels=True)
-                if hasattr(ct_ds, 'ImageOrientationPatient'):
+                ct_ds = dcmread(ct_path, stop_before_pixels=True, specific_tags=['ImageOrientationPatient'])
+                if 'ImageOrientationPatient' in ct_ds:
                     orientation = ct_ds.ImageOrientationPatient
                     logger.info(f"Found ImageOrientationPatient in {ct_file}: {orientation}")
                     break
@@ -97,22 +121,27 @@ class ContourProcessor:
         
         # Fix all CT images that are missing the tags
         files_fixed = 0
-        for ct_file in ct_files:
+        for entry in ct_entries:
+            ct_file, ct_path = entry.name, entry.path
             try:
-                ct_path = os.path.join(dcm_path, ct_file)
+                # Check the header first; only files that actually need fixing are read with pixel data
+                header = dcmread(ct_path, stop_before_pixels=True, specific_tags=_SPATIAL_TAGS)
+                if 'ImageOrientationPatient' in header and 'ImagePositionPatient' in header:
+                    continue
+
                 ct_ds = dcmread(ct_path)
                 modified = False
                 
                 # Check and add ImageOrientationPatient
-                if not hasattr(ct_ds, 'ImageOrientationPatient'):
+                if 'ImageOrientationPatient' not in ct_ds:
                     logger.warning(f"CT image {ct_file} missing ImageOrientationPatient, adding: {orientation}")
                     ct_ds.ImageOrientationPatient = orientation
                     modified = True
                 
                 # Check and add ImagePositionPatient
-                if not hasattr(ct_ds, 'ImagePositionPatient'):
+                if 'ImagePositionPatient' not in ct_ds:
                     # Try to derive from SliceLocation if available
-                    if hasattr(ct_ds, 'SliceLocation'):
+                    if 'SliceLocation' in ct_ds:
                         position = [0, 0, float(ct_ds.SliceLocation)]
                         logger.warning(f"CT image {ct_file} missing ImagePositionPatient, deriving from SliceLocation: {position}")
                     else:
@@ -143,12 +172,12 @@ class ContourProcessor:
             rt_ds = dcmread(struct_path)
             modified = False
             
-            if not hasattr(rt_ds, 'ImageOrientationPatient'):
+            if 'ImageOrientationPatient' not in rt_ds:
                 logger.warning(f"RTSTRUCT missing ImageOrientationPatient, adding: {orientation}")
                 rt_ds.ImageOrientationPatient = orientation
                 modified = True
             
-            if not hasattr(rt_ds, 'ImagePositionPatient'):
+            if 'ImagePositionPatient' not in rt_ds:
                 position = [0, 0, 0]
                 logger.warning(f"RTSTRUCT missing ImagePositionPatient, adding: {position}")
                 rt_ds.ImagePositionPatient = position
@@ -168,7 +197,7 @@ class ContourProcessor:
             if 'temp_path' in locals() and os.path.exists(temp_path):
                 os.remove(temp_path)
 
-    def _create_first_contour_mask(self, rt_struct):
+    def _create_first_contour_mask(self, rt_struct, roi_masks):
         """Creates a binary mask from the first valid non-SKULL contour."""
         all_rois = rt_struct.get_roi_names()
         ignore_terms = self.processing_config.get("ignore_contour_names_containing", ["skull"])
@@ -184,17 +213,97 @@ class ContourProcessor:
         for roi in rois_to_process:
             try:
                 logger.info(f"Attempting to use contour for overlay plane: {roi}")
-                mask_3d = rt_struct.get_roi_mask_by_name(roi)
+                mask_3d = self._get_roi_mask(rt_struct, roi, roi_masks)
                 logger.info(f"Successfully used contour for overlay plane: {roi}")
-                return mask_3d
+                return self._as_binary_uint8(mask_3d)
             except Exception as e:
                 logger.warning(f"Could not get mask for ROI '{roi}'. Trying next. Error: {e}")
 
         logger.error("No valid contours found to create an overlay.")
         raise ValueError("No valid contours found to create an overlay.")
 
-    def _get_individual_contours(self, rt_struct):
-        """Returns a list of individual contour masks for multi-color visualization."""
+    @staticmethod
+    def _get_roi_mask(rt_struct, roi, roi_masks):
+        """Returns the rasterized mask for an ROI, decoding it only on first use."""
+        if roi not in roi_masks:
+            roi_masks[roi] = rt_struct.get_roi_mask_by_name(roi)
+        return roi_masks[roi]
+
+    @staticmethod
+    def _as_binary_uint8(mask):
+        """Returns a 0/1 uint8 mask, reusing the buffer of a boolean mask instead of copying it."""
+        if mask.dtype == np.bool_:
+            return mask.view(np.uint8)
+        return (mask > 0).astype(np.uint8)
+
+    @staticmethod
+    def _pack_overlay_slices(mask_slices):
+        """
+        Packs every slice of a slice-first 0/1 mask into Overlay Data in one pass.
+
+        Returns a (slices, bytes_per_slice) uint8 array: each row is one slice packed
+        LSB first, padded to an even length for OW.
+        """
+        packed = np.packbits(mask_slices.reshape(len(mask_slices), -1), axis=1, bitorder='little')
+        if packed.shape[1] % 2:
+            packed = np.pad(packed, ((0, 0), (0, 1)))
+        return packed
+
+    @staticmethod
+    def _instance_uids(count):
+        """Returns `count` unique SOP Instance UIDs derived from one freshly generated root."""
+        # Trim the root so that '.<index>' still fits within the 64 character UID limit
+        root = uid.generate_uid()[:64 - 1 - len(str(count))].rstrip('.')
+        return [f"{root}.{i}" for i in range(1, count + 1)]
+
+    def _series_attributes(self, number_key, number_default, desc_key, desc_default, **extra):
+        """
+        Returns the attributes shared by every slice of a new output series.
+
+        Covers a fresh SeriesInstanceUID, SeriesNumber/SeriesDescription from the processing
+        config, the series date/time stamps and any `extra` keyword attributes.
+        """
+        return {
+            'SeriesInstanceUID': uid.generate_uid(),
+            'SeriesNumber': self.processing_config.get(number_key, number_default),
+            'SeriesDescription': self.processing_config.get(desc_key, desc_default),
+            **extra,
+            **self._series_timestamps(),
+        }
+
+    @staticmethod
+    def _series_timestamps():
+        """Returns Content/Series date and time stamped once for a whole new series."""
+        now = datetime.datetime.now()
+        date_str = now.strftime('%Y%m%d')
+        time_str = now.strftime('%H%M%S.%f')
+        return {
+            'ContentDate': date_str,
+            'ContentTime': time_str,
+            'SeriesDate': date_str,
+            'SeriesTime': time_str,
+        }
+
+    @staticmethod
+    def _normalize_to_uint8(img):
+        """Stretches a slice's full value range to uint8, via a lookup table for integer pixel data."""
+        min_val, max_val = img.min(), img.max()
+        if max_val == min_val:
+            return np.zeros(img.shape, dtype=np.uint8)
+        value_range = int(max_val) - int(min_val) if np.issubdtype(img.dtype, np.integer) else None
+        if value_range is not None and value_range <= 0xFFFF:
+            # One table entry per stored value replaces the per-pixel float divide/multiply with a gather
+            lut = (np.arange(value_range + 1, dtype=np.int64) * 255 // value_range).astype(np.uint8)
+            # Offsets are bounded by value_range, but the subtraction itself must not overflow
+            # (uint32 values >= 2**31, wide int64 values), so do it in int64 before indexing
+            return lut[np.subtract(img, int(min_val), dtype=np.int64).astype(np.intp)]
+        return ((img - min_val) / (max_val - min_val) * 255).astype(np.uint8)
+
+    def _get_individual_contours(self, rt_struct, roi_masks):
+        """Returns a list of individual contour masks for multi-color visualization.
+
+        Masks are stored slice-first as (slices, rows, cols) so each slice is one contiguous block.
+        """
         all_rois = rt_struct.get_roi_names()
         ignore_terms = self.processing_config.get("ignore_contour_names_containing", ["skull"])
         rois_to_process = [r for r in all_rois if not any(term.lower() in r.lower() for term in ignore_terms)]
@@ -204,54 +313,22 @@ class ContourProcessor:
         contour_list = []
         for roi in rois_to_process:
             try:
-                mask_3d = rt_struct.get_roi_mask_by_name(roi)
-                contour_list.append({'name': roi, 'mask': mask_3d})
+                mask_3d = self._get_roi_mask(rt_struct, roi, roi_masks)
+                contour_list.append({'name': roi, 'mask': np.ascontiguousarray(np.moveaxis(mask_3d, 2, 0))})
             except Exception as e:
                 logger.warning(f"Could not get mask for ROI '{roi}'. Skipping. Error: {e}")
 
         return contour_list
 
-    def _create_merged_mask(self, rt_struct):
-        """Merges specified ROI contours into a single binary 3D mask."""
-        all_rois = rt_struct.get_roi_names()
-        ignore_terms = self.processing_config.get("ignore_contour_names_containing", ["skull"])
-        rois_to_process = [r for r in all_rois if not any(term.lower() in r.lower() for term in ignore_terms)]
-
-        logger.info(f"Original ROIs found: {all_rois}")
-        logger.info(f"Ignoring contours containing: {ignore_terms}")
-        logger.info(f"ROIs to be merged into mask: {rois_to_process}")
-
-        if not rois_to_process:
-            raise ValueError("No contours left to process after filtering.")
-
-        # Initialize a blank mask with the shape of the 3D image volume
-        base_mask = rt_struct.get_roi_mask_by_name(rois_to_process[0])
-        merged_mask = np.zeros_like(base_mask, dtype=bool)
-
-        for roi in rois_to_process:
-            try:
-                mask_3d = rt_struct.get_roi_mask_by_name(roi)
-                merged_mask = np.logical_or(merged_mask, mask_3d)
-            except Exception as e:
-                logger.warning(f"Could not get mask for ROI '{roi}'. Skipping. Error: {e}")
-
-        return merged_mask
-
     def _sort_dicom_files(self, dcm_path):
         """Sorts DICOM files in a directory by SliceLocation."""
-        files = [f for f in os.listdir(dcm_path) if f.lower().endswith('.dcm')]
+        with os.scandir(dcm_path) as it:
+            entries = [e for e in it if e.is_file() and e.name.lower().endswith('.dcm')]
         
-        dicom_files_with_location = []
-        for filename in files:
-            try:
-                full_path = os.path.join(dcm_path, filename)
-                dcm = dcmread(full_path, stop_before_pixels=True)
-                if hasattr(dcm, 'SliceLocation'):
-                    dicom_files_with_location.append((dcm.SliceLocation, filename))
-                else:
-                    logger.warning(f"File {filename} has no SliceLocation, cannot sort it correctly.")
-            except Exception as e:
-                logger.warning(f"Could not read {filename} to get SliceLocation: {e}")
+        # Header reads are dominated by file I/O; overlap them across threads
+        with ThreadPoolExecutor(max_workers=resolve_max_workers(self.processing_config.get("max_workers"))) as executor:
+            locations = list(executor.map(self._read_slice_location, entries))
+        dicom_files_with_location = [item for item in locations if item is not None]
 
         # Sort by SliceLocation (the first element of the tuple)
         dicom_files_with_location.sort(key=lambda x: x[0])
@@ -259,84 +336,100 @@ class ContourProcessor:
         # Return only the filenames in the correct order
         return [filename for _, filename in dicom_files_with_location]
 
-    def _create_overlay_series(self, dcm_path, mask_3d, output_path):
+    @staticmethod
+    def _read_slice_location(entry):
+        """Returns (SliceLocation, filename) for a directory entry, or None if it cannot be sorted."""
+        filename = entry.name
+        try:
+            # Sorting needs one element; don't build the rest of the header
+            dcm = dcmread(entry.path, stop_before_pixels=True, specific_tags=['SliceLocation'])
+            if 'SliceLocation' in dcm:
+                return dcm.SliceLocation, filename
+            logger.warning(f"File {filename} has no SliceLocation, cannot sort it correctly.")
+        except Exception as e:
+            logger.warning(f"Could not read {filename} to get SliceLocation: {e}")
+        return None
+
+    def _create_overlay_series(self, dcm_path, sorted_files, mask_3d, output_path, executor):
         """Creates a new DICOM series with the provided mask as an overlay."""
-        sorted_files = self._sort_dicom_files(dcm_path)
-        new_series_uid = uid.generate_uid()
-        
-        for i, filename in enumerate(sorted_files):
-            ds = dcmread(os.path.join(dcm_path, filename))
-            if not hasattr(ds, 'SliceLocation'):
-                logger.debug(f"Skipping file {filename} as it has no SliceLocation.")
-                continue
 
-            new_ds = self._add_overlay_to_slice(ds, mask_3d[:, :, i], new_series_uid)
-            output_filename = os.path.join(output_path, f"OVERLAY-{filename}")
-            new_ds.save_as(output_filename, enforce_file_format=True)
+        series_attributes = self._series_attributes(
+            "overlay_series_number", 98,
+            "overlay_series_description", "Contour Overlay",
+            StudyID=self.processing_config.get("overlay_study_id", "RTPlanShare"),
+        )
+
+        # rt-utils masks are (rows, cols, slices); go slice-first so each slice is one contiguous block
+        mask_slices = np.ascontiguousarray(np.moveaxis(mask_3d, 2, 0))
+        overlay_slices = self._pack_overlay_slices(mask_slices)
+        
+        # Slices are independent once the mask is built. pydicom decode/encode holds the GIL,
+        # so spread the read/encode/write over processes; each task only carries its packed plane.
+        n_slices = len(sorted_files)
+        list(executor.map(
+            self._write_overlay_slice,
+            [dcm_path] * n_slices,
+            sorted_files,
+            [overlay_slices[i].tobytes() for i in range(n_slices)],
+            self._instance_uids(n_slices),
+            [series_attributes] * n_slices,
+            [output_path] * n_slices,
+            chunksize=8,
+        ))
         logger.info(f"Successfully created {len(sorted_files)} files in new overlay series.")
 
-    def _add_overlay_to_slice(self, ds, mask_slice, series_uid):
-        """Adds a single overlay plane to a pydicom dataset."""
+    @staticmethod
+    def _write_overlay_slice(dcm_path, filename, overlay_data, sop_instance_uid, series_attributes, output_path):
+        """Reads one source slice, adds its overlay plane and writes it to the output series."""
+        # Pixel data is copied through untouched; defer it so it is only read back while saving
+        ds = dcmread(os.path.join(dcm_path, filename), defer_size='1 KB')
+        if 'SliceLocation' not in ds:
+            logger.debug(f"Skipping file {filename} as it has no SliceLocation.")
+            return
+
+        new_ds = ContourProcessor._add_overlay_to_slice(ds, overlay_data, sop_instance_uid, series_attributes)
+        output_filename = os.path.join(output_path, f"OVERLAY-{filename}")
+        new_ds.save_as(output_filename, enforce_file_format=True)
+
+    @staticmethod
+    def _add_overlay_to_slice(ds, overlay_data, sop_instance_uid, series_attributes):
+        """Adds a single overlay plane, given as packed Overlay Data bytes, to a pydicom dataset."""
         # These tags are modified for the new series
         ds.SOPClassUID = '1.2.840.10008.5.1.4.1.1.2' # CT Image Storage
         ds.file_meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.2'
-        ds.SOPInstanceUID = uid.generate_uid()
-        ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
-        ds.SeriesInstanceUID = series_uid
-
-        # Set new series attributes from config
-        ds.SeriesNumber = self.processing_config.get("overlay_series_number", 98)
-        ds.SeriesDescription = self.processing_config.get("overlay_series_description", "Contour Overlay")
-        ds.StudyID = self.processing_config.get("overlay_study_id", "RTPlanShare")
+        ds.SOPInstanceUID = sop_instance_uid
+        ds.file_meta.MediaStorageSOPInstanceUID = sop_instance_uid
 
-        # Update date and time to current
-        now = datetime.datetime.now()
-        ds.ContentDate = now.strftime('%Y%m%d')
-        ds.ContentTime = now.strftime('%H%M%S.%f')
-        ds.SeriesDate = now.strftime('%Y%m%d')
-        ds.SeriesTime = now.strftime('%H%M%S.%f')
+        for keyword, value in series_attributes.items():
+            setattr(ds, keyword, value)
 
         # Add overlay data
-        overlay_group = 0x6000
-        ds.add_new(Tag(overlay_group, 0x0010), 'US', ds.Rows)
-        ds.add_new(Tag(overlay_group, 0x0011), 'US', ds.Columns)
-        ds.add_new(Tag(overlay_group, 0x0015), 'IS', '1') # Number of Frames in Overlay
-        ds.add_new(Tag(overlay_group, 0x0040), 'CS', 'R') # ROI Area
-        ds.add_new(Tag(overlay_group, 0x0050), 'SS', [1, 1]) # Overlay Origin
-        ds.add_new(Tag(overlay_group, 0x0100), 'US', 1) # Bits Allocated
-        ds.add_new(Tag(overlay_group, 0x0102), 'US', 0) # Bit Position
-        ds.add_new(Tag(overlay_group, 0x3000), 'OW', pack_bits(mask_slice))
+        ds.add_new(_OVERLAY_ROWS, 'US', ds.Rows)
+        ds.add_new(_OVERLAY_COLUMNS, 'US', ds.Columns)
+        for tag, vr, value in _OVERLAY_FIXED_ELEMENTS:
+            ds.add_new(tag, vr, value)
+        ds.add_new(_OVERLAY_DATA, 'OW', overlay_data)
 
         return ds
     
-    def _create_secondary_capture_dicom(self, original_ds, rgb_array, series_uid, slice_index):
-        """Create a Secondary Capture DICOM from RGB image data."""
-        import copy
-        import datetime
-        
-        # Create a copy of the original dataset
-        new_ds = copy.deepcopy(original_ds)
+    def _create_secondary_capture_dicom(self, original_ds, rgb_array, sop_instance_uid, series_attributes, slice_index):
+        """Create a Secondary Capture DICOM from RGB image data.
+
+        The source dataset is converted in place and returned; callers read it only for this.
+        """
+        # Every slice-varying attribute below is overwritten, so a copy (pixels included) buys nothing
+        new_ds = original_ds
         
         # Set Secondary Capture SOP Class
         new_ds.SOPClassUID = '1.2.840.10008.5.1.4.1.1.7'  # Secondary Capture Image Storage
         new_ds.file_meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.7'
         
-        # Generate new UIDs
-        new_ds.SOPInstanceUID = uid.generate_uid()
-        new_ds.file_meta.MediaStorageSOPInstanceUID = new_ds.SOPInstanceUID
-        new_ds.SeriesInstanceUID = series_uid
-        
-        # Set series-level attributes
-        new_ds.SeriesNumber = self.processing_config.get("debug_series_number", 101)
-        new_ds.SeriesDescription = self.processing_config.get("debug_series_description", "DEBUG: Contour Overlay")
-        new_ds.Modality = "SC"  # Secondary Capture
+        # Instance UID derived from the series' UID root by the caller
+        new_ds.SOPInstanceUID = sop_instance_uid
+        new_ds.file_meta.MediaStorageSOPInstanceUID = sop_instance_uid
         
-        # Update dates/times
-        now = datetime.datetime.now()
-        new_ds.ContentDate = now.strftime('%Y%m%d')
-        new_ds.ContentTime = now.strftime('%H%M%S.%f')
-        new_ds.SeriesDate = now.strftime('%Y%m%d')
-        new_ds.SeriesTime = now.strftime('%H%M%S.%f')
+        for keyword, value in series_attributes.items():
+            setattr(new_ds, keyword, value)
         
         # Set image pixel data
         new_ds.Rows, new_ds.Columns, _ = rgb_array.shape
@@ -355,146 +448,206 @@ class ContourProcessor:
         new_ds.InstanceNumber = slice_index + 1
         
         # Remove overlay data if present (since we're creating a new visualization)
-        overlay_tags = [tag for tag in new_ds.keys() if tag.group == 0x6000]
+        overlay_tags = [tag for tag in new_ds.keys() if tag.group == _OVERLAY_GROUP]
         for tag in overlay_tags:
-            delattr(new_ds, tag)
+            del new_ds[tag]
         
         return new_ds
     
-    def save_debug_visualization(self, dcm_path, contour_list, output_dir, study_uid, burn_in_text=None):
+    def save_debug_visualization(self, dcm_path, contour_list, output_dir, study_uid, burn_in_text=None, sorted_files=None, executor=None):
         """Save debug JPG images showing multiple colored contour overlays on DICOM slices."""
         debug_dir = os.path.join(output_dir, "debug_visualization")
         os.makedirs(debug_dir, exist_ok=True)
 
-        sorted_files = self._sort_dicom_files(dcm_path)
+        if sorted_files is None:
+            sorted_files = self._sort_dicom_files(dcm_path)
         logger.info(f"Creating debug visualization for {len(sorted_files)} slices with {len(contour_list)} contours in {debug_dir}")
 
         # Define color rotation (starting with red)
         colors = ['red', 'blue', 'green', 'yellow', 'cyan', 'magenta', 'orange', 'purple']
 
-        for i, filename in enumerate(sorted_files):
-            try:
-                # Read the original DICOM file
-                ds = pydicom.dcmread(os.path.join(dcm_path, filename))
-                if not hasattr(ds, 'SliceLocation'):
-                    continue
-
-                # Check if slice index is valid for all contours
-                if i >= contour_list[0]['mask'].shape[2]:
-                    continue
-
-                # Get the image data and normalize to 8-bit
-                img_data = ds.pixel_array
-                img_normalized = ((img_data - img_data.min()) / (img_data.max() - img_data.min()) * 255).astype(np.uint8)
-
-                # Create the visualization
-                fig, ax = plt.subplots(figsize=(10, 10))
-                ax.imshow(img_normalized, cmap='gray', alpha=1.0)
-
-                # Overlay each contour with a different color
-                contour_names = []
-                for idx, contour_info in enumerate(contour_list):
-                    mask_slice = contour_info['mask'][:, :, i]
-                    contour_name = contour_info['name']
-                    color = colors[idx % len(colors)]  # Rotate through colors
-
-                    if np.any(mask_slice):
-                        ax.contour(mask_slice, levels=[0.5], colors=color, linewidths=2)
-                        contour_names.append(f"{contour_name} ({color})")
-
-                title_text = f'Study: {study_uid}\nSlice {i+1}: {filename}\n' + ', '.join(contour_names)
-                ax.set_title(title_text, fontsize=8)
-                ax.axis('off')
-
-                if burn_in_text:
-                    fig.text(0.01, 0.01, burn_in_text, fontsize=6, color='yellow', ha='left', va='bottom')
+        # Only the slices that exist in every mask can be drawn
+        n_slices = min(len(sorted_files), contour_list[0]['mask'].shape[0]) if contour_list else 0
+
+        # Hand each worker just its own 2-D slice of the contours that actually cross it
+        occupied = [contour_info['mask'].any(axis=(1, 2)) for contour_info in contour_list]
+        slice_contours = [
+            [
+                (contour_info['name'], colors[idx % len(colors)], contour_info['mask'][i])
+                for idx, contour_info in enumerate(contour_list)
+                if occupied[idx][i]
+            ]
+            for i in range(n_slices)
+        ]
+
+        # Agg rendering is CPU bound and pyplot is not thread safe, so render slices in processes
+        render_args = (
+            [dcm_path] * n_slices,
+            sorted_files[:n_slices],
+            range(n_slices),
+            slice_contours,
+            [study_uid] * n_slices,
+            [burn_in_text] * n_slices,
+            [debug_dir] * n_slices,
+        )
+        with worker_pool(executor, self.processing_config.get("max_workers")) as pool:
+            if isinstance(pool, ProcessPoolExecutor):
+                list(pool.map(self._render_debug_slice, *render_args, chunksize=4))
+            else:
+                logger.warning("No process pool available. Rendering debug visualization serially.")
+                list(map(self._render_debug_slice, *render_args))
 
-                # Save as JPG
-                jpg_filename = f"slice_{i+1:03d}_{filename.replace('.dcm', '.jpg')}"
-                jpg_path = os.path.join(debug_dir, jpg_filename)
-                plt.savefig(jpg_path, format='jpg', bbox_inches='tight', dpi=150)
-                plt.close()
+        logger.info(f"Debug visualization complete. Images saved to: {debug_dir}")
 
-            except Exception as e:
-                logger.warning(f"Could not create debug visualization for slice {i}: {e}")
-                continue
+    @staticmethod
+    def _render_debug_slice(dcm_path, filename, i, slice_contours, study_uid, burn_in_text, debug_dir):
+        """Renders one slice with its (name, color, mask) contours to a debug JPG."""
+        try:
+            # Read the original DICOM file
+            ds = pydicom.dcmread(os.path.join(dcm_path, filename))
+            if 'SliceLocation' not in ds:
+                return
+
+            # Get the image data; a blank slice with no contours carries nothing worth drawing
+            img_data = ds.pixel_array
+            if not slice_contours and np.ptp(img_data) == 0:
+                logger.debug(f"Skipping debug visualization for blank slice {i}: {filename}")
+                return
+
+            # Normalize to 8-bit
+            img_normalized = ContourProcessor._normalize_to_uint8(img_data)
+
+            # Create the visualization
+            fig, ax = plt.subplots(figsize=(10, 10))
+            ax.imshow(img_normalized, cmap='gray', alpha=1.0)
+
+            # Overlay each contour with a different color
+            contour_names = []
+            for contour_name, color, mask_slice in slice_contours:
+                ax.contour(mask_slice, levels=[0.5], colors=color, linewidths=2)
+                contour_names.append(f"{contour_name} ({color})")
+
+            title_text = f'Study: {study_uid}\nSlice {i+1}: {filename}\n' + ', '.join(contour_names)
+            ax.set_title(title_text, fontsize=8)
+            ax.axis('off')
+
+            if burn_in_text:
+                fig.text(0.01, 0.01, burn_in_text, fontsize=6, color='yellow', ha='left', va='bottom')
+
+            # Save as JPG
+            jpg_filename = f"slice_{i+1:03d}_{filename.replace('.dcm', '.jpg')}"
+            jpg_path = os.path.join(debug_dir, jpg_filename)
+            fig.savefig(jpg_path, format='jpg', bbox_inches='tight', dpi=150)
+            plt.close(fig)
 
-        logger.info(f"Debug visualization complete. Images saved to: {debug_dir}")
+        except Exception as e:
+            logger.warning(f"Could not create debug visualization for slice {i}: {e}")
 
-    def create_debug_dicom_series(self, dcm_path, contour_list, output_dir, study_uid, burn_in_text=None):
+    def create_debug_dicom_series(self, dcm_path, contour_list, output_dir, study_uid, burn_in_text=None, sorted_files=None):
         """Create a DICOM Secondary Capture series from debug visualizations with colored contours."""
         debug_dicom_dir = os.path.join(output_dir, "DebugDicom")
         os.makedirs(debug_dicom_dir, exist_ok=True)
 
-        sorted_files = self._sort_dicom_files(dcm_path)
+        if sorted_files is None:
+            sorted_files = self._sort_dicom_files(dcm_path)
         logger.info(f"Creating debug DICOM series for {len(sorted_files)} slices with {len(contour_list)} contours in {debug_dicom_dir}")
 
         # Define color rotation (starting with red)
         colors = ['red', 'blue', 'green', 'yellow', 'cyan', 'magenta', 'orange', 'purple']
 
-        new_series_uid = uid.generate_uid()
+        series_attributes = self._series_attributes(
+            "debug_series_number", 101,
+            "debug_series_description", "DEBUG: Contour Overlay",
+            Modality="SC",  # Secondary Capture
+        )
 
-        for i, filename in enumerate(sorted_files):
-            try:
-                ds = pydicom.dcmread(os.path.join(dcm_path, filename))
-                if not hasattr(ds, 'SliceLocation'):
-                    continue
-
-                # Check if slice index is valid for all contours
-                if i >= contour_list[0]['mask'].shape[2]:
-                    continue
+        instance_uids = self._instance_uids(len(sorted_files))
 
-                # Create the visualization with matplotlib (high quality)
-                img_data = ds.pixel_array
-                img_normalized = ((img_data - img_data.min()) / (img_data.max() - img_data.min()) * 255).astype(np.uint8)
-
-                # Create figure with exact pixel dimensions for 1:1 mapping
-                dpi = 100
-                fig_width = img_data.shape[1] / dpi
-                fig_height = img_data.shape[0] / dpi
-
-                fig, ax = plt.subplots(figsize=(fig_width, fig_height), dpi=dpi)
-                ax.imshow(img_normalized, cmap='gray', alpha=1.0)
+        # One figure is reused for the whole series; only the image data and contours change per slice
+        fig = ax = background = None
+        contour_sets = []
+        # Rendering needs the single figure, but finished slices can be encoded and written alongside it
+        writer = ThreadPoolExecutor(max_workers=resolve_max_workers(self.processing_config.get("max_workers")))
+        pending_writes = []
+        try:
+            for i, filename in enumerate(sorted_files):
+                try:
+                    ds = pydicom.dcmread(os.path.join(dcm_path, filename))
+                    if 'SliceLocation' not in ds:
+                        continue
+
+                    # Check if slice index is valid for all contours
+                    if i >= contour_list[0]['mask'].shape[0]:
+                        continue
+
+                    # Create the visualization with matplotlib (high quality)
+                    img_data = ds.pixel_array
+                    img_normalized = self._normalize_to_uint8(img_data)
+
+                    if fig is None or background.get_array().shape != img_normalized.shape:
+                        if fig is not None:
+                            plt.close(fig)
+
+                        # Create figure with exact pixel dimensions for 1:1 mapping
+                        dpi = 100
+                        fig_width = img_data.shape[1] / dpi
+                        fig_height = img_data.shape[0] / dpi
+
+                        fig, ax = plt.subplots(figsize=(fig_width, fig_height), dpi=dpi)
+                        # Fixed 8-bit range so later slices can swap in their data without rescaling
+                        background = ax.imshow(img_normalized, cmap='gray', alpha=1.0, vmin=0, vmax=255)
+                        # The axes outlive every slice; keep them on the image extent so contours
+                        # (whose mask extent can differ from the image) never rescale the view
+                        ax.set_autoscale_on(False)
+                        contour_sets = []
+
+                        ax.axis('off')
+                        fig.subplots_adjust(left=0, right=1, top=1, bottom=0, wspace=0, hspace=0)
+
+                        if burn_in_text:
+                            fig.text(0.01, 0.01, burn_in_text, fontsize=6, color='yellow', ha='left', va='bottom')
+                    else:
+                        background.set_data(img_normalized)
 
-                # Overlay each contour with a different color
-                for idx, contour_info in enumerate(contour_list):
-                    mask_slice = contour_info['mask'][:, :, i]
-                    color = colors[idx % len(colors)]  # Rotate through colors
+                    # Drop the previous slice's contours before drawing this one's
+                    for contour_set in contour_sets:
+                        contour_set.remove()
+                    contour_sets = []
 
-                    if np.any(mask_slice):
-                        # High quality matplotlib contours with rotating colors
-                        ax.contour(mask_slice, levels=[0.5], colors=color, linewidths=1, alpha=0.8)
+                    # Overlay each contour with a different color
+                    for idx, contour_info in enumerate(contour_list):
+                        mask_slice = contour_info['mask'][i]
+                        color = colors[idx % len(colors)]  # Rotate through colors
 
-                ax.axis('off')
-                fig.subplots_adjust(left=0, right=1, top=1, bottom=0, wspace=0, hspace=0)
+                        if np.any(mask_slice):
+                            # High quality matplotlib contours with rotating colors
+                            contour_sets.append(ax.contour(mask_slice, levels=[0.5], colors=color, linewidths=1, alpha=0.8))
 
-                if burn_in_text:
-                    fig.text(0.01, 0.01, burn_in_text, fontsize=6, color='yellow', ha='left', va='bottom')
+                    # Rasterize straight from the Agg canvas; the figure already spans the image 1:1,
+                    # so there is no need to encode a PNG and decode it back
+                    fig.canvas.draw()
+                    rgb_array = np.array(fig.canvas.buffer_rgba())[:, :, :3]
 
-                # Robust method to get RGB array - works across matplotlib versions
-                from io import BytesIO
-                buf = BytesIO()
-                fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight', pad_inches=0)
-                buf.seek(0)
+                    # Create new DICOM dataset
+                    new_ds = self._create_secondary_capture_dicom(ds, rgb_array, instance_uids[i], series_attributes, i)
 
-                # Read back as RGB array using PIL (more reliable than canvas methods)
-                from PIL import Image
-                pil_img = Image.open(buf)
-                rgb_array = np.array(pil_img.convert('RGB'))
+                    # Save the DICOM file
+                    output_filename = os.path.join(debug_dicom_dir, f"DEBUG-{filename}")
+                    pending_writes.append((i, writer.submit(new_ds.save_as, output_filename, enforce_file_format=True)))
 
+                except Exception as e:
+                    logger.warning(f"Could not create debug DICOM for slice {i}: {e}")
+                    continue
+        finally:
+            if fig is not None:
                 plt.close(fig)  # Important: close the figure to free memory
-                buf.close()
-
-                # Create new DICOM dataset
-                new_ds = self._create_secondary_capture_dicom(ds, rgb_array, new_series_uid, i)
-
-                # Save the DICOM file
-                output_filename = os.path.join(debug_dicom_dir, f"DEBUG-{filename}")
-                new_ds.save_as(output_filename, enforce_file_format=True)
+            writer.shutdown(wait=True)
 
+        for i, future in pending_writes:
+            try:
+                future.result()
             except Exception as e:
                 logger.warning(f"Could not create debug DICOM for slice {i}: {e}")
-                continue
 
         logger.info(f"Debug DICOM series created in: {debug_dicom_dir}")
         return debug_dicom_dir
\ No newline at end of file
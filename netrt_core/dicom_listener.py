@@ -1,5 +1,4 @@
 import logging
-from pydicom.filewriter import write_file_meta_info
 from pynetdicom import AE, evt, AllStoragePresentationContexts, ALL_TRANSFER_SYNTAXES
 from pynetdicom.sop_class import Verification
 
@@ -14,9 +14,7 @@ from pydicom.uid import (
     ExplicitVRLittleEndian,
     ExplicitVRBigEndian,
     JPEGBaseline8Bit,
-    JPEGExtended12Bit,
-    JPEG2000Lossless,
-    JPEG2000
+    JPEG2000Lossless
 )
 
 logger = logging.getLogger(__name__)
@@ -81,7 +79,8 @@ class DicomSender:
             logger.error(f"Directory not found: {directory_path}")
             return False
 
-        dicom_files = [os.path.join(directory_path, f) for f in os.listdir(directory_path) if f.lower().endswith('.dcm')]
+        with os.scandir(directory_path) as entries:
+            dicom_files = [entry.path for entry in entries if entry.is_file() and entry.name.lower().endswith('.dcm')]
         if not dicom_files:
             logger.warning(f"No DICOM files found in {directory_path} to send.")
             return True # No files to send is not a failure
@@ -106,10 +106,12 @@ class NewStudyEventHandler(FileSystemEventHandler):
         # Count total files in DCM and Structure directories to ensure sufficient content
         total_files = 0
         if os.path.isdir(dcm_dir):
-            total_files += len([f for f in os.listdir(dcm_dir) if os.path.isfile(os.path.join(dcm_dir, f))])
+            with os.scandir(dcm_dir) as entries:
+                total_files += sum(1 for entry in entries if entry.is_file())
         struct_dir = os.path.join(study_path, "Structure")
         if os.path.isdir(struct_dir):
-            total_files += len([f for f in os.listdir(struct_dir) if os.path.isfile(os.path.join(struct_dir, f))])
+            with os.scandir(struct_dir) as entries:
+                total_files += sum(1 for entry in entries if entry.is_file())
 
         # Skip processing if minimum file threshold not met
         if total_files < self.min_file_count_for_processing:
@@ -1,12 +1,12 @@
 import os
 import logging
 import time
-import pydicom
 
 from .dicom_sender import DicomSender
 from .burn_in_processor import BurnInProcessor
 from .contour_processor import ContourProcessor
 from .report_generator import ReportGenerator
+from .worker_pool import create_executor
 from DicomAnonymizer import DicomAnonymizer
 import datetime
 
@@ -21,7 +21,8 @@ class StudyProcessor:
         self.fsm = file_system_manager
         self.anonymizer = DicomAnonymizer(self.config.get("anonymization", {}))
         self.contour_processor = ContourProcessor(self.config)
-        self.burn_in_processor = BurnInProcessor(self.config.get("processing", {}).get("burn_in_text"))
+        processing_config = self.config.get("processing", {})
+        self.burn_in_processor = BurnInProcessor(processing_config.get("burn_in_text"), processing_config.get("max_workers"))
 
     def process_study(self, study_instance_uid, sender_info=None):
         """Main entry point for processing a study."""
@@ -37,7 +38,8 @@ class StudyProcessor:
         try:
             dcm_path, struct_path, addition_path = self._setup_paths(study_path)
 
-            num_dicom_files = len([f for f in os.listdir(dcm_path) if f.lower().endswith('.dcm')])
+            with os.scandir(dcm_path) as entries:
+                num_dicom_files = sum(1 for entry in entries if entry.name.lower().endswith('.dcm'))
             report.add_line(f"Number of DICOM files received: {num_dicom_files}")
 
             if not self._validate_inputs(dcm_path, study_instance_uid):
@@ -56,19 +58,21 @@ class StudyProcessor:
             if struct_file:
                 report.add_line("Contour processing started...")
                 burn_in_text = self.config.get("processing", {}).get("burn_in_text")
-                success, debug_dicom_dir = self.contour_processor.run(
-                    dcm_path, struct_file, addition_path,
-                    self.config.get('debug_mode', False), study_instance_uid,
-                    burn_in_text=burn_in_text
-                )
-                if not success:
-                    raise Exception("Contour processing failed")
-                report.add_line("Contour processing successful.")
-
-                if self.config.get("processing", {}).get("add_burn_in_disclaimer", True):
-                    report.add_line("Adding burn-in disclaimer...")
-                    self.burn_in_processor.run(addition_path)
-                    report.add_line("Burn-in disclaimer added.")
+                # One bounded pool serves every per-slice step of this study
+                with create_executor(self.config.get("processing", {}).get("max_workers")) as executor:
+                    success, debug_dicom_dir = self.contour_processor.run(
+                        dcm_path, struct_file, addition_path,
+                        self.config.get('debug_mode', False), study_instance_uid,
+                        burn_in_text=burn_in_text, executor=executor
+                    )
+                    if not success:
+                        raise Exception("Contour processing failed")
+                    report.add_line("Contour processing successful.")
+
+                    if self.config.get("processing", {}).get("add_burn_in_disclaimer", True):
+                        report.add_line("Adding burn-in disclaimer...")
+                        self.burn_in_processor.run(addition_path, executor=executor)
+                        report.add_line("Burn-in disclaimer added.")
 
                 report.add_line("Sending processed series...")
                 send_success = self._send_directory(addition_path, "OVERLAY", study_instance_uid)
@@ -125,10 +129,12 @@ class StudyProcessor:
 
     def _find_struct_file(self, struct_dir_path):
         """Finds the first DICOM file in the Structure directory."""
-        if not os.path.isdir(struct_dir_path) or not os.listdir(struct_dir_path):
+        if not os.path.isdir(struct_dir_path):
             return None
         
-        struct_files = [os.path.join(struct_dir_path, f) for f in os.listdir(struct_dir_path) if f.lower().endswith(".dcm")]
+        # A single directory pass covers both the emptiness check and the .dcm filter
+        with os.scandir(struct_dir_path) as entries:
+            struct_files = [entry.path for entry in entries if entry.name.lower().endswith(".dcm")]
         if not struct_files:
             return None
         
@@ -139,10 +145,13 @@ class StudyProcessor:
     def _anonymize_study(self, dcm_path, struct_file_path):
         """Anonymizes all DICOM files in a study."""
         logger.info(f"Anonymizing files in {dcm_path}...")
-        for root, _, files in os.walk(dcm_path):
-            for filename in files:
-                if filename.lower().endswith(".dcm"):
-                    self.anonymizer.anonymize_file(os.path.join(root, filename))
+        filepaths = [
+            os.path.join(root, filename)
+            for root, _, files in os.walk(dcm_path)
+            for filename in files
+            if filename.lower().endswith(".dcm")
+        ]
+        self.anonymizer.anonymize_files(filepaths, self.config.get("processing", {}).get("max_workers"))
         
         if struct_file_path:
             logger.info(f"Anonymizing RTSTRUCT file: {struct_file_path}")
@@ -0,0 +1,68 @@
+import os
+import logging
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# The daemon shares its host with the DICOM listener and the file watcher,
+# so a pool never takes every core unless processing.max_workers asks for it
+DEFAULT_MAX_WORKERS = 4
+
+
+def resolve_max_workers(max_workers=None):
+    """
+    Returns the number of workers to use for per-slice processing.
+
+    Args:
+        max_workers (int, optional): The configured worker count (processing.max_workers).
+            When not set, the smaller of DEFAULT_MAX_WORKERS and the cores this process may run on.
+    """
+    if max_workers:
+        return max(1, int(max_workers))
+    try:
+        # Honours CPU affinity (taskset, cpusets); os.cpu_count() reports every host core
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+    return max(1, min(DEFAULT_MAX_WORKERS, available))
+
+
+def _start_context():
+    """
+    Returns a multiprocessing context that does not fork the daemon itself.
+
+    Pools are created from watcher timer threads while the DICOM listener and the
+    watchdog observer are running; a forked child inherits their held locks (logging
+    handlers included) and can deadlock. Workers therefore start from a clean
+    interpreter and only ever run module-level functions or picklable processor methods.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def create_executor(max_workers=None):
+    """
+    Creates a process pool with a bounded worker count, falling back to threads
+    where processes are unavailable. The caller owns the executor and must shut it down.
+    """
+    workers = resolve_max_workers(max_workers)
+    try:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=_start_context())
+    except (NotImplementedError, OSError) as e:
+        logger.warning(f"Process pool unavailable ({e}). Falling back to {workers} threads.")
+        return ThreadPoolExecutor(max_workers=workers)
+
+
+@contextmanager
+def worker_pool(executor=None, max_workers=None):
+    """
+    Yields `executor` when one is given (the caller keeps ownership of it),
+    otherwise a new pool from create_executor() that is shut down on exit.
+    """
+    if executor is not None:
+        yield executor
+        return
+    with create_executor(max_workers) as pool:
+        yield pool